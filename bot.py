@@ -1,12 +1,14 @@
+import asyncio
+import functools
 import logging
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Coroutine, Optional
 
 import discord
 from discord import app_commands
 
-from loot_data import LootDataError, LootDataStore, LootItem
+from loot_data import LootDataError, LootDataStore
 
 
 DATA_BASE_PATH = Path("data/Items_base.csv")
@@ -32,54 +34,45 @@ class LootBot(discord.Client):
         super().__init__(intents=intents)
         self.tree = app_commands.CommandTree(self)
         self.data_store = LootDataStore(DATA_BASE_PATH, DATA_LOOT_PATH)
-        self.last_load_error: Optional[str] = None
+        self._loading = asyncio.Lock()
 
     async def setup_hook(self) -> None:
         await self._load_data()
         await self.tree.sync()
 
     async def _load_data(self) -> None:
-        try:
-            self.data_store.load()
-            self.last_load_error = None
-            logger.info("Loaded %s loot items", len(self.data_store.items))
-        except LootDataError as exc:
-            self.last_load_error = str(exc)
-            logger.error("Failed to load loot data: %s", exc)
+        # Parsing runs on a worker thread so the gateway heartbeat keeps going.
+        async with self._loading:
+            try:
+                await asyncio.to_thread(self.data_store.load)
+                logger.info("Loaded %s loot items", len(self.data_store))
+            except LootDataError as exc:
+                logger.error("Failed to load loot data: %s", exc)
+            except Exception:
+                # load() already recorded the error, which gates /loot; keep
+                # the bot running so /loot_reload can report and retry.
+                logger.exception("Unexpected error while loading loot data")
 
 
 bot = LootBot()
 
 
-def _format_item(item: LootItem) -> str:
-    subtype = f" — {item.subtype}" if item.subtype else ""
-    return f"• **{item.name}** ({item.category}{subtype}) — {item.rarity}"
-
-
-def _filter_items(
-    items: List[LootItem],
-    rarity: Optional[str],
-    category: Optional[str],
-    subtype: Optional[str],
-    tags: Optional[List[str]],
-) -> List[LootItem]:
-    filtered = items
-    if rarity:
-        rarity_norm = rarity.strip().lower()
-        filtered = [item for item in filtered if item.rarity_norm == rarity_norm]
-    if category:
-        category_norm = category.strip().lower()
-        filtered = [item for item in filtered if item.category_norm == category_norm]
-    if subtype:
-        subtype_norm = subtype.strip().lower()
-        filtered = [item for item in filtered if subtype_norm in item.subtype_norm]
-    if tags:
-        filtered = [
-            item
-            for item in filtered
-            if all(tag in item.tags for tag in tags)
-        ]
-    return filtered
+def _require_loaded(
+    handler: Callable[..., Coroutine[Any, Any, None]],
+) -> Callable[..., Coroutine[Any, Any, None]]:
+    @functools.wraps(handler)
+    async def wrapper(
+        interaction: discord.Interaction, *args: Any, **kwargs: Any
+    ) -> None:
+        load_error = bot.data_store.last_load_error
+        if load_error:
+            await interaction.response.send_message(
+                f"Loot data is unavailable: {load_error}", ephemeral=True
+            )
+            return
+        await handler(interaction, *args, **kwargs)
+
+    return wrapper
 
 
 @bot.tree.command(name="loot", description="Find loot items with optional filters.")
@@ -93,6 +86,7 @@ def _filter_items(
 @app_commands.choices(
     rarity=[app_commands.Choice(name=choice, value=choice) for choice in RARITY_CHOICES]
 )
+@_require_loaded
 async def loot(
     interaction: discord.Interaction,
     rarity: Optional[app_commands.Choice[str]] = None,
@@ -101,12 +95,6 @@ async def loot(
     tag: Optional[str] = None,
     limit: Optional[int] = None,
 ) -> None:
-    if bot.last_load_error:
-        await interaction.response.send_message(
-            f"Loot data is unavailable: {bot.last_load_error}", ephemeral=True
-        )
-        return
-
     parsed_limit = limit or DEFAULT_LIMIT
     if parsed_limit <= 0:
         await interaction.response.send_message(
@@ -124,46 +112,40 @@ async def loot(
                 ephemeral=True,
             )
             return
-        tags = [t.strip().lower() for t in tag.split(",") if t.strip()]
+        tags = [t.strip().casefold() for t in tag.split(",") if t.strip()]
         if not tags:
             await interaction.response.send_message(
                 "Tag filter must include at least one tag.", ephemeral=True
             )
             return
 
-    results = _filter_items(
-        bot.data_store.items,
+    message = bot.data_store.query(
         rarity.value if rarity else None,
         category,
         subtype,
         tags,
+        parsed_limit,
     )
 
-    if not results:
+    if message is None:
         await interaction.response.send_message(
             "No items matched your filters.", ephemeral=True
         )
         return
 
-    total = len(results)
-    preview = results[:parsed_limit]
-    lines = [
-        f"Found {total} item(s). Showing {len(preview)}:",
-        *(_format_item(item) for item in preview),
-    ]
-    await interaction.response.send_message("\n".join(lines))
+    await interaction.response.send_message(message)
 
 
 @bot.tree.command(name="loot_reload", description="Reload loot data from CSVs.")
 async def loot_reload(interaction: discord.Interaction) -> None:
     await bot._load_data()
-    if bot.last_load_error:
+    if bot.data_store.last_load_error:
         await interaction.response.send_message(
-            f"Reload failed: {bot.last_load_error}", ephemeral=True
+            f"Reload failed: {bot.data_store.last_load_error}", ephemeral=True
         )
         return
     await interaction.response.send_message(
-        f"Reloaded {len(bot.data_store.items)} items.", ephemeral=True
+        f"Reloaded {len(bot.data_store)} items.", ephemeral=True
     )
 
 
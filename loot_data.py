@@ -1,14 +1,31 @@
 import csv
-from dataclasses import dataclass
+import pickle
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 
 REQUIRED_BASE_COLUMNS = {"item_id", "name", "category", "subtype"}
 REQUIRED_LOOT_COLUMNS = {"item_id", "rarity"}
+CACHE_FILENAME = ".loot_cache.pkl"
+QUERY_CACHE_SIZE = 256
+# Bump whenever LootColumns or the cached store layout changes.
+CACHE_VERSION = 8
 
 
-@dataclass
+@dataclass(slots=True)
 class LootItem:
     item_id: str
     name: str
@@ -16,66 +33,214 @@ class LootItem:
     subtype: str
     rarity: str
     tags: List[str]
+    category_norm: str
+    rarity_norm: str
+    subtype_norm: str
+    tags_set: FrozenSet[str]
+    display_line: str
 
-    @property
-    def category_norm(self) -> str:
-        return self.category.strip().lower()
 
-    @property
-    def rarity_norm(self) -> str:
-        return self.rarity.strip().lower()
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").strip().casefold()
 
-    @property
-    def subtype_norm(self) -> str:
-        return self.subtype.strip().lower()
+
+def _index_key(value: str) -> str:
+    """Return the normalized form the store indexes rarity and category by."""
+    return sys.intern(_normalize(value))
+
+
+def _format_line(name: str, category: str, subtype: str, rarity: str) -> str:
+    subtype_part = f" — {subtype}" if subtype else ""
+    return f"• **{name}** ({category}{subtype_part}) — {rarity}"
+
+
+@dataclass(slots=True)
+class LootColumns:
+    """Loot item fields stored as parallel lists, one entry per item."""
+
+    item_ids: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    categories: List[str] = field(default_factory=list)
+    subtypes: List[str] = field(default_factory=list)
+    rarities: List[str] = field(default_factory=list)
+    tags: List[List[str]] = field(default_factory=list)
+    category_norms: List[str] = field(default_factory=list)
+    rarity_norms: List[str] = field(default_factory=list)
+    subtype_norms: List[str] = field(default_factory=list)
+    tag_masks: List[int] = field(default_factory=list)
+    display_lines: List[str] = field(default_factory=list)
+    # One bit per distinct tag; an item's tag mask ORs the bits of its tags.
+    tag_bits: Dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def append(
+        self,
+        item_id: str,
+        name: str,
+        category: str,
+        subtype: str,
+        rarity: str,
+        tags: List[str],
+    ) -> None:
+        self.item_ids.append(item_id)
+        self.names.append(name)
+        self.categories.append(category)
+        self.subtypes.append(subtype)
+        self.rarities.append(rarity)
+        self.tags.append(tags)
+        self.category_norms.append(_index_key(category))
+        self.rarity_norms.append(_index_key(rarity))
+        self.subtype_norms.append(_normalize(subtype))
+        tag_mask = 0
+        for tag in tags:
+            bit = self.tag_bits.get(tag)
+            if bit is None:
+                bit = self.tag_bits[tag] = 1 << len(self.tag_bits)
+            tag_mask |= bit
+        self.tag_masks.append(tag_mask)
+        self.display_lines.append(_format_line(name, category, subtype, rarity))
+
+    def intern_keys(self) -> None:
+        """Re-intern the normalized rarity, category and tag values in place."""
+        self.rarity_norms = list(map(sys.intern, self.rarity_norms))
+        self.category_norms = list(map(sys.intern, self.category_norms))
+        self.tags = [list(map(sys.intern, tags)) for tags in self.tags]
+        self.tag_bits = {sys.intern(tag): bit for tag, bit in self.tag_bits.items()}
+
+    def item(self, index: int) -> LootItem:
+        return LootItem(
+            item_id=self.item_ids[index],
+            name=self.names[index],
+            category=self.categories[index],
+            subtype=self.subtypes[index],
+            rarity=self.rarities[index],
+            tags=self.tags[index],
+            category_norm=self.category_norms[index],
+            rarity_norm=self.rarity_norms[index],
+            subtype_norm=self.subtype_norms[index],
+            tags_set=frozenset(self.tags[index]),
+            display_line=self.display_lines[index],
+        )
 
 
 class LootDataError(RuntimeError):
     pass
 
 
+@dataclass(frozen=True, eq=False)
+class _Snapshot:
+    """Everything a query reads, published with a single attribute assignment."""
+
+    columns: LootColumns
+    has_tags: bool
+    by_rarity: Dict[str, List[int]]
+    by_category: Dict[str, List[int]]
+    by_tag: Dict[str, Set[int]]
+
+
 class LootDataStore:
-    def __init__(self, base_path: Path, loot_path: Path) -> None:
+    def __init__(
+        self,
+        base_path: Path,
+        loot_path: Path,
+        cache_path: Optional[Path] = None,
+    ) -> None:
         self.base_path = base_path
         self.loot_path = loot_path
-        self.items: List[LootItem] = []
-        self.has_tags: bool = False
+        self.cache_path = cache_path or base_path.parent / CACHE_FILENAME
+        self.last_load_error: Optional[str] = None
+        # (snapshot, memoized query) pair, replaced as a whole by _publish().
+        self._current: Tuple[_Snapshot, Callable[..., Optional[str]]]
+        self._publish(self._build_snapshot(LootColumns(), False))
+
+    def __len__(self) -> int:
+        return len(self._current[0].columns)
+
+    @property
+    def columns(self) -> LootColumns:
+        return self._current[0].columns
+
+    @property
+    def has_tags(self) -> bool:
+        return self._current[0].has_tags
+
+    @property
+    def items(self) -> List[LootItem]:
+        """Materialize every loaded row as a LootItem."""
+        columns = self._current[0].columns
+        return [columns.item(index) for index in range(len(columns))]
 
     def load(self) -> None:
-        base_rows = self._read_csv(self.base_path)
-        loot_rows = self._read_csv(self.loot_path)
+        try:
+            self._load()
+        except Exception as exc:
+            # /loot is gated on this, so record every failure, not just ours.
+            if isinstance(exc, LootDataError):
+                self.last_load_error = str(exc)
+            else:
+                self.last_load_error = f"{type(exc).__name__}: {exc}"
+            raise
+        self.last_load_error = None
+
+    def _load(self) -> None:
+        cache_key = self._cache_key()
+        cached = self._load_cache(cache_key) if cache_key is not None else None
+        if cached is not None:
+            # Unpickled strings are not interned, so restore that and rebuild
+            # the indexes over the shared keys.
+            columns, has_tags = cached
+            columns.intern_keys()
+            self._publish(self._build_snapshot(columns, has_tags))
+            return
 
-        self._validate_columns(self.base_path, base_rows, REQUIRED_BASE_COLUMNS)
-        self._validate_columns(self.loot_path, loot_rows, REQUIRED_LOOT_COLUMNS)
+        base_fields, base_rows = self._read_csv(self.base_path, REQUIRED_BASE_COLUMNS)
+        loot_fields, loot_rows = self._read_csv(self.loot_path, REQUIRED_LOOT_COLUMNS)
 
-        base_by_id = {row["item_id"]: row for row in base_rows}
-        tags_column = self._find_tags_column(base_rows, loot_rows)
-        self.has_tags = tags_column is not None
+        base_id_idx = base_fields.index("item_id")
+        name_idx = base_fields.index("name")
+        category_idx = base_fields.index("category")
+        subtype_idx = base_fields.index("subtype")
+        loot_id_idx = loot_fields.index("item_id")
+        rarity_idx = loot_fields.index("rarity")
+        tags_column, tags_in_base = self._find_tags_column(base_fields, loot_fields)
+        has_tags = tags_column is not None
 
-        items: List[LootItem] = []
+        # Keep only the base columns the join needs so the row lists can go.
+        base_index_by_id = {
+            row[base_id_idx]: index for index, row in enumerate(base_rows)
+        }
+        base_names = [row[name_idx] for row in base_rows]
+        base_categories = [row[category_idx] for row in base_rows]
+        base_subtypes = [row[subtype_idx] for row in base_rows]
+        get_raw_tags: Callable[[List[str], int], Optional[str]]
+        if tags_column is None:
+            get_raw_tags = lambda row, base_index: None
+        elif tags_in_base:
+            tags_idx = base_fields.index(tags_column)
+            base_tags = [row[tags_idx] for row in base_rows]
+            get_raw_tags = lambda row, base_index: base_tags[base_index]
+        else:
+            tags_idx = loot_fields.index(tags_column)
+            get_raw_tags = lambda row, base_index: row[tags_idx]
+        del base_rows
+
+        columns = LootColumns()
         missing_ids = []
         for row in loot_rows:
-            item_id = row["item_id"]
-            base_row = base_by_id.get(item_id)
-            if not base_row:
+            item_id = row[loot_id_idx]
+            base_index = base_index_by_id.get(item_id)
+            if base_index is None:
                 missing_ids.append(item_id)
                 continue
-            if tags_column and tags_column in base_row:
-                raw_tags = base_row.get(tags_column)
-            elif tags_column:
-                raw_tags = row.get(tags_column)
-            else:
-                raw_tags = None
-            tags = self._parse_tags(raw_tags)
-            items.append(
-                LootItem(
-                    item_id=item_id,
-                    name=base_row["name"],
-                    category=base_row["category"],
-                    subtype=base_row.get("subtype", ""),
-                    rarity=row.get("rarity", ""),
-                    tags=tags,
-                )
+            columns.append(
+                item_id=item_id,
+                name=base_names[base_index],
+                category=base_categories[base_index],
+                subtype=base_subtypes[base_index],
+                rarity=row[rarity_idx],
+                tags=self._parse_tags(get_raw_tags(row, base_index)),
             )
 
         if missing_ids:
@@ -86,27 +251,250 @@ class LootDataStore:
                 + ("..." if len(missing_ids) > 5 else "")
             )
 
-        self.items = items
+        self._publish(self._build_snapshot(columns, has_tags))
+        if cache_key is not None:
+            self._write_cache(cache_key, columns, has_tags)
+
+    def query(
+        self,
+        rarity: Optional[str],
+        category: Optional[str],
+        subtype: Optional[str],
+        tags: Optional[List[str]],
+        limit: int,
+    ) -> Optional[str]:
+        """Return the formatted result message, or None if nothing matched.
+
+        Results are memoized per normalized query until the next load().
+        """
+        _, query_cached = self._current
+        return query_cached(
+            _index_key(rarity) if rarity else None,
+            _index_key(category) if category else None,
+            _normalize(subtype) if subtype else None,
+            tuple(sorted(set(tags))) if tags else None,
+            limit,
+        )
+
+    def _query(
+        self,
+        snapshot: _Snapshot,
+        rarity_norm: Optional[str],
+        category_norm: Optional[str],
+        subtype_norm: Optional[str],
+        tags_key: Optional[Tuple[str, ...]],
+        limit: int,
+    ) -> Optional[str]:
+        matches = self._filter_normalized(
+            snapshot,
+            rarity_norm,
+            category_norm,
+            subtype_norm,
+            frozenset(tags_key) if tags_key else None,
+        )
+        if not matches:
+            return None
+        display_lines = snapshot.columns.display_lines
+        preview = matches[:limit]
+        lines = [f"Found {len(matches)} item(s). Showing {len(preview)}:"]
+        lines.extend(map(display_lines.__getitem__, preview))
+        return "\n".join(lines)
 
-    def _read_csv(self, path: Path) -> List[Dict[str, str]]:
+    def filter_items(
+        self,
+        rarity: Optional[str] = None,
+        category: Optional[str] = None,
+        subtype: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+    ) -> List[LootItem]:
+        snapshot = self._current[0]
+        matches = self._filter_normalized(
+            snapshot,
+            _normalize(rarity) if rarity else None,
+            _normalize(category) if category else None,
+            _normalize(subtype) if subtype else None,
+            frozenset(tags) if tags else None,
+        )
+        return [snapshot.columns.item(index) for index in matches]
+
+    def _filter_normalized(
+        self,
+        snapshot: _Snapshot,
+        rarity_norm: Optional[str],
+        category_norm: Optional[str],
+        subtype_norm: Optional[str],
+        tags_set: Optional[FrozenSet[str]],
+    ) -> List[int]:
+        """Return the row indexes matching every supplied filter, in file order."""
+        # Seed from the most selective index, then check the remaining filters.
+        # Any filter with no indexed matches means the whole query is empty.
+        candidates: List[Sequence[int]] = []
+        if rarity_norm is not None:
+            rarity_matches = snapshot.by_rarity.get(rarity_norm)
+            if not rarity_matches:
+                return []
+            candidates.append(rarity_matches)
+        if category_norm is not None:
+            category_matches = snapshot.by_category.get(category_norm)
+            if not category_matches:
+                return []
+            candidates.append(category_matches)
+        if tags_set is not None:
+            tag_matches: List[Set[int]] = []
+            for tag in tags_set:
+                indexes = snapshot.by_tag.get(tag)
+                if not indexes:
+                    return []
+                tag_matches.append(indexes)
+            matches = set.intersection(*tag_matches)
+            if not matches:
+                return []
+            candidates.append(sorted(matches))
+        columns = snapshot.columns
+        seed = min(candidates, key=len) if candidates else range(len(columns))
+        if subtype_norm is None and len(candidates) <= 1:
+            # The seed already is the answer; copy it with one exact-size allocation.
+            return list(seed)
+        need_mask = 0
+        if tags_set is not None:
+            for tag in tags_set:
+                need_mask |= columns.tag_bits[tag]
+        rarity_col = columns.rarity_norms
+        category_col = columns.category_norms
+        subtype_col = columns.subtype_norms
+        tag_mask_col = columns.tag_masks
+        return [
+            index
+            for index in seed
+            if (rarity_norm is None or rarity_col[index] == rarity_norm)
+            and (category_norm is None or category_col[index] == category_norm)
+            and (subtype_norm is None or subtype_norm in subtype_col[index])
+            and (tags_set is None or (tag_mask_col[index] & need_mask) == need_mask)
+        ]
+
+    def _build_snapshot(self, columns: LootColumns, has_tags: bool) -> _Snapshot:
+        by_rarity: Dict[str, List[int]] = {}
+        by_category: Dict[str, List[int]] = {}
+        by_tag: Dict[str, Set[int]] = {}
+        for index in range(len(columns)):
+            by_rarity.setdefault(columns.rarity_norms[index], []).append(index)
+            by_category.setdefault(columns.category_norms[index], []).append(index)
+            for tag in columns.tags[index]:
+                by_tag.setdefault(tag, set()).add(index)
+        return _Snapshot(columns, has_tags, by_rarity, by_category, by_tag)
+
+    def _publish(self, snapshot: _Snapshot) -> None:
+        # load() may run on a worker thread while queries are served. Queries
+        # read self._current once, and each snapshot gets its own memo, so a
+        # query racing a reload sees old or new data but never a mix, and
+        # cannot leave a stale result in the new memo.
+        query_cached = lru_cache(maxsize=QUERY_CACHE_SIZE)(
+            partial(self._query, snapshot)
+        )
+        self._current = (snapshot, query_cached)
+
+    def _cache_key(self) -> Optional[Tuple[int, ...]]:
+        try:
+            base_stat = self.base_path.stat()
+            loot_stat = self.loot_path.stat()
+        except OSError:
+            return None
+        return (
+            CACHE_VERSION,
+            base_stat.st_mtime_ns,
+            base_stat.st_size,
+            loot_stat.st_mtime_ns,
+            loot_stat.st_size,
+        )
+
+    def _load_cache(
+        self, cache_key: Tuple[int, ...]
+    ) -> Optional[Tuple[LootColumns, bool]]:
+        try:
+            with self.cache_path.open("rb") as handle:
+                cached = pickle.load(handle)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated, corrupt or written by an incompatible Python: drop it
+            # so the next load rebuilds it instead of failing on every start.
+            self._discard_cache()
+            return None
+        if (
+            not isinstance(cached, tuple)
+            or len(cached) != 3
+            or not isinstance(cached[1], LootColumns)
+            or not isinstance(cached[2], bool)
+        ):
+            self._discard_cache()
+            return None
+        if cached[0] != cache_key:
+            return None
+        return cached[1], cached[2]
+
+    def _discard_cache(self) -> None:
+        try:
+            self.cache_path.unlink()
+        except OSError:
+            pass
+
+    def _write_cache(
+        self, cache_key: Tuple[int, ...], columns: LootColumns, has_tags: bool
+    ) -> None:
+        # The indexes are cheap to rebuild, so only the columns are stored.
+        payload = (cache_key, columns, has_tags)
+        temp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        try:
+            with temp_path.open("wb") as handle:
+                pickle.dump(payload, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            temp_path.replace(self.cache_path)
+        except OSError:
+            # The cache is only an optimization; a read-only data dir is fine.
+            pass
+
+    def _read_csv(
+        self, path: Path, required: Iterable[str]
+    ) -> Tuple[List[str], List[List[str]]]:
         if not path.exists():
             raise LootDataError(f"Missing required file: {path}")
+        # The bot runs load() on a worker thread, so streaming the file here
+        # never blocks the event loop and keeps only one buffer in memory.
         with path.open("r", encoding="utf-8-sig", newline="") as handle:
-            reader = csv.DictReader(handle)
-            if reader.fieldnames is None:
-                raise LootDataError(f"CSV file has no header row: {path}")
-            return list(reader)
+            reader = csv.reader(handle)
+            try:
+                fieldnames = next(reader, None)
+                if fieldnames is None:
+                    raise LootDataError(f"CSV file has no header row: {path}")
+                # Check the schema before materializing any rows.
+                self._validate_columns(path, fieldnames, required)
+                width = len(fieldnames)
+                rows = []
+                for row in reader:
+                    if not row:
+                        continue
+                    if len(row) < width:
+                        # Short rows get blank values, like DictReader's restval.
+                        row.extend([""] * (width - len(row)))
+                    rows.append(row)
+            except UnicodeDecodeError as exc:
+                raise LootDataError(
+                    f"CSV file {path} is not valid UTF-8: {exc}"
+                ) from exc
+            except csv.Error as exc:
+                raise LootDataError(
+                    f"Could not parse CSV file {path} (line {reader.line_num}): {exc}"
+                ) from exc
+        if not rows:
+            raise LootDataError(f"CSV file is empty: {path}")
+        return fieldnames, rows
 
     def _validate_columns(
         self,
         path: Path,
-        rows: List[Dict[str, str]],
+        fieldnames: List[str],
         required: Iterable[str],
     ) -> None:
-        if not rows:
-            raise LootDataError(f"CSV file is empty: {path}")
-        available = set(rows[0].keys())
-        missing = set(required) - available
+        missing = set(required) - set(fieldnames)
         if missing:
             missing_list = ", ".join(sorted(missing))
             raise LootDataError(
@@ -115,17 +503,23 @@ class LootDataStore:
 
     def _find_tags_column(
         self,
-        base_rows: List[Dict[str, str]],
-        loot_rows: List[Dict[str, str]],
-    ) -> Optional[str]:
+        base_fields: List[str],
+        loot_fields: List[str],
+    ) -> Tuple[Optional[str], bool]:
+        """Return the tags column name and whether it comes from the base CSV."""
         candidate_columns = ["tags", "tag", "item_tags"]
-        available = set(base_rows[0].keys()) | set(loot_rows[0].keys())
         for column in candidate_columns:
-            if column in available:
-                return column
-        return None
+            if column in base_fields:
+                return column, True
+            if column in loot_fields:
+                return column, False
+        return None, False
 
     def _parse_tags(self, raw_value: Optional[str]) -> List[str]:
         if not raw_value:
             return []
-        return [tag.strip().lower() for tag in raw_value.split(",") if tag.strip()]
+        return [
+            sys.intern(tag.strip().casefold())
+            for tag in raw_value.split(",")
+            if tag.strip()
+        ]